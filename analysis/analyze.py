@@ -1,34 +1,27 @@
-import math
 import statistics
 
 def calculate_stats(filename="output.txt"):
-    throughputs = []
-    delays = []
-    jitters = []
-    scores = []
+    rows = []
 
     print(f"Reading data from {filename}...\n")
 
     with open(filename, "r") as f:
         for line in f:
-            line = line.strip()
             if line.count(",") == 3:
                 try:
-                    parts = line.split(",")
-                    t = float(parts[0])
-                    d = float(parts[1])
-                    j = float(parts[2])
-                    s = float(parts[3])
-
-                    throughputs.append(t)
-                    delays.append(d)
-                    jitters.append(j)
-                    scores.append(s)
+                    rows.append(tuple(map(float, line.split(","))))
                 except ValueError:
                     continue
 
+    if not rows:
+        print("Total Runs Analyzed: 0")
+        return
+
+    # Transpose once into per-metric columns
+    throughputs, delays, jitters, scores = zip(*rows)
+
     def print_row(label, data):
-        avg = statistics.mean(data)
+        avg = statistics.fmean(data)
         stdev = statistics.stdev(data) if len(data) > 1 else 0.0
         print(f"{label:<20} | Average: {avg:12.6f} | Std Dev: {stdev:10.6f}")
 
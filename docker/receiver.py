@@ -1,3 +1,4 @@
+import hashlib
 import os
 import socket
 import sys
@@ -18,6 +19,16 @@ def create_acknowledgement(seq_id, message: str) -> bytes:
     )
 
 
+def file_sha256(path: str) -> bytes:
+    with open(path, "rb") as f:
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, "sha256").digest()
+        digest = hashlib.sha256()
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+        return digest.digest()
+
+
 def resolve_payload_path() -> tuple[str, str]:
     payload = (
         os.environ.get("TEST_FILE") or os.environ.get("PAYLOAD_FILE") or "/hdd/file.zip"
@@ -162,11 +173,10 @@ def main():
 
                 if original_size == received_size:
                     print(f"✓ File size matches original: {original_size:,} bytes")
-                    with open(payload_file, "rb") as f1, open(output_file, "rb") as f2:
-                        if f1.read() == f2.read():
-                            print("✓ File content matches original perfectly!")
-                        else:
-                            print("✗ File size matches but content differs")
+                    if file_sha256(payload_file) == file_sha256(output_file):
+                        print("✓ File content matches original perfectly!")
+                    else:
+                        print("✗ File size matches but content differs")
                 else:
                     print(
                         f"✗ File size mismatch: original={original_size:,}, received={received_size:,}"
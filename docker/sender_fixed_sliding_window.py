@@ -20,27 +20,42 @@ Notes:
 
 from __future__ import annotations
 
+import ctypes
+import errno
+import mmap
 import os
+import selectors
 import socket
+import struct
 import sys
 import time
-from typing import List, Tuple, Dict
+from array import array
+from bisect import bisect_left
+from typing import List, Tuple
 
 PACKET_SIZE = 1024
 SEQ_ID_SIZE = 4
 MSS = PACKET_SIZE - SEQ_ID_SIZE
 ACK_TIMEOUT = 0.5
 MAX_TIMEOUTS = 10
+# Socket buffer size, large enough that window bursts and ACK floods aren't dropped
+SOCK_BUF_SIZE = 4 * 1024 * 1024
 WINDOW_SIZE = 100
+# Max packets handed to a single sendmmsg(2) call
+SEND_BATCH = 100
 
 HOST = os.environ.get("RECEIVER_HOST", "127.0.0.1")
 PORT = int(os.environ.get("RECEIVER_PORT", "5001"))
 
+# Big-endian signed sequence id header
+_HDR = struct.Struct(">i")
 
-def load_payload_chunks() -> List[bytes]:
+
+def load_packets() -> Tuple[List[bytes], int]:
     """
     Reads the selected payload file (or falls back to file.zip) and returns
-    up to two MSS-sized chunks for the demo transfer.
+    one serialized packet per MSS-sized chunk, whose sequence id is the
+    chunk's byte offset, along with the file size.
     """
     candidates = [
         os.environ.get("TEST_FILE"),
@@ -52,49 +67,151 @@ def load_payload_chunks() -> List[bytes]:
     for path in candidates:
         if not path:
             continue
-        expanded = os.path.expanduser(path)
-        if os.path.exists(expanded):
-            with open(expanded, "rb") as f:
-                data = f.read()
+        # Try the open directly rather than stat-ing first
+        try:
+            f = open(os.path.expanduser(path), "rb")
+        except OSError:
+            continue
+        with f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return [], 0
+            # Build packets straight from a read-only mapping so neither the whole
+            # file nor a second copy of every chunk is ever held
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                packets = [make_packet(i, data[i : i + MSS]) for i in range(0, len(data), MSS)]
+                return packets, len(data)
+
+    print(
+        "Could not find payload file (tried TEST_FILE, PAYLOAD_FILE, file.zip)",
+        file=sys.stderr,
+    )
+    sys.exit(1)
+
+
+class _IOVec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_char_p), ("iov_len", ctypes.c_size_t)]
+
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.POINTER(_IOVec)),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
+
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _MsgHdr), ("msg_len", ctypes.c_uint)]
+
+
+class _SockAddrIn(ctypes.Structure):
+    _fields_ = [
+        ("sin_family", ctypes.c_ushort),
+        ("sin_port", ctypes.c_uint16),
+        ("sin_addr", ctypes.c_ubyte * 4),
+        ("sin_zero", ctypes.c_ubyte * 8),
+    ]
+
+
+# The senders only run on Linux, so sendmmsg(2) is always there
+_libc_sendmmsg = ctypes.CDLL(None, use_errno=True).sendmmsg
+_libc_sendmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int]
+_libc_sendmmsg.restype = ctypes.c_int
+
+
+def _resolve_sockaddr(addr: Tuple[str, int]) -> _SockAddrIn:
+    """Resolves addr once into the sockaddr_in every mmsghdr points at."""
+    dest = _SockAddrIn()
+    dest.sin_family = socket.AF_INET
+    dest.sin_port = socket.htons(addr[1])
+    dest.sin_addr[:] = socket.inet_aton(socket.gethostbyname(addr[0]))
+    return dest
+
+
+def _build_mmsgs(pkts: List[bytes], dest: _SockAddrIn) -> ctypes.Array:
+    """
+    Builds one mmsghdr per packet, each pointing at dest and its own iovec,
+    so a batch is just a pointer into the array. dest must outlive the result.
+    """
+    iovs = (_IOVec * len(pkts))()
+    msgs = (_MMsgHdr * len(pkts))()
+    for i, pkt in enumerate(pkts):
+        iov = iovs[i]
+        iov.iov_base = pkt
+        iov.iov_len = len(pkt)
+        hdr = msgs[i].msg_hdr
+        hdr.msg_name = ctypes.addressof(dest)
+        hdr.msg_namelen = ctypes.sizeof(dest)
+        hdr.msg_iov = ctypes.pointer(iov)
+        hdr.msg_iovlen = 1
+    return msgs
+
+
+def _sendmmsg(sock: socket.socket, msgs: ctypes.Array, start: int, stop: int) -> int:
+    """
+    Sends the packets behind msgs[start:stop] using as few sendmmsg(2) calls
+    as possible and returns how many were handed to the kernel.
+    """
+    fd = sock.fileno()
+    msg_size = ctypes.sizeof(_MMsgHdr)
+    msgs_addr = ctypes.addressof(msgs)
+    total = 0
+    while total < stop - start:
+        count = min(stop - start - total, SEND_BATCH)
+        sent = _libc_sendmmsg(fd, msgs_addr + (start + total) * msg_size, count, 0)
+        if sent < 0:
+            err = ctypes.get_errno()
+            # Retry on signal interruption, as socket.sendto does (PEP 475)
+            if err == errno.EINTR:
+                continue
+            if err in (errno.EAGAIN, errno.EWOULDBLOCK):
+                break
+            raise OSError(err, os.strerror(err))
+        total += sent
+        if sent < count:
             break
-    else:
-        print(
-            "Could not find payload file (tried TEST_FILE, PAYLOAD_FILE, file.zip)",
-            file=sys.stderr,
-        )
-        sys.exit(1)
 
-    return [data[i : i + MSS] for i in range(0, len(data), MSS)]
+    return total
 
 
 def make_packet(seq_id: int, payload: bytes) -> bytes:
-    return int.to_bytes(seq_id, SEQ_ID_SIZE, byteorder="big", signed=True) + payload
+    return _HDR.pack(seq_id) + payload
 
 
-def parse_ack(packet: bytes) -> Tuple[int, str]:
-    seq = int.from_bytes(packet[:SEQ_ID_SIZE], byteorder="big", signed=True)
-    msg = packet[SEQ_ID_SIZE:].decode(errors="ignore")
+def parse_ack(packet: memoryview) -> Tuple[int, str]:
+    seq, = _HDR.unpack_from(packet)
+    msg = str(packet[SEQ_ID_SIZE:], "ascii", "ignore")
     return seq, msg
 
 
-def print_metrics(total_bytes: int, duration: float, delays: List[float]) -> None:
+def print_metrics(
+    total_bytes: int,
+    duration: float,
+    delay_sum: int,
+    delay_count: int,
+    jitter_sum: int,
+    jitter_count: int,
+) -> None:
     """
     Print transfer metrics in the format expected by test scripts.
 
-    TODO: Students should replace the hardcoded delay/jitter/score values
-    with actual calculated metrics from their implementation.
+    Delay and jitter arrive as running sums in nanoseconds and are converted
+    to seconds here.
     """
     throughput = total_bytes / duration
     avg_delay = 0.0
     avg_jitter = 0.0
 
-    if delays:
-        avg_delay = sum(delays) / len(delays) 
+    if delay_count:
+        avg_delay = delay_sum / delay_count / 1e9
+
+    if jitter_count:
+        avg_jitter = jitter_sum / jitter_count / 1e9
 
-    if len(delays) > 1:
-        jitter_sum = sum(abs(delays[i] - delays[i-1]) for i in range(1, len(delays)))
-        avg_jitter = jitter_sum / (len(delays) - 1)
- 
 
     # Prevents divide by zero errors
     safe_jitter = avg_jitter if avg_jitter > 0 else 1e-6
@@ -110,74 +227,110 @@ def print_metrics(total_bytes: int, duration: float, delays: List[float]) -> Non
 
 
 def main() -> None:
-    demo_chunks = load_payload_chunks()
-    transfers: List[Tuple[int, bytes]] = []
+    # Parallel arrays indexed by packet number. Packets are serialized once
+    # so (re)transmits never rebuild them.
+    packets, total_bytes = load_packets()
+    seq_ids = array("i", range(0, total_bytes, MSS))
 
-    seq = 0
-    for chunk in demo_chunks:
-        transfers.append((seq, chunk))
-        seq += len(chunk)
-
-    # EOF marker
-    transfers.append((seq, b""))
-    total_bytes = sum(len(chunk) for chunk in demo_chunks)
+    # EOF marker, kept out of the data arrays and sent once all data is in flight
+    eof_pkt = make_packet(total_bytes, b"")
 
     print(f"Connecting to receiver at {HOST}:{PORT}")
     print(
-        f"Demo transfer will send {total_bytes} bytes across {len(demo_chunks)} packets (+EOF)."
+        f"Demo transfer will send {total_bytes} bytes across {len(packets)} packets (+EOF)."
     )
 
-    start = time.time()
-    packet_delays = []
+    start = time.monotonic_ns()
+    # Running delay/jitter totals in nanoseconds
+    delay_sum = 0
+    delay_count = 0
+    prev_delay_ns = 0
+    jitter_sum = 0
+    jitter_count = 0
 
     # Sliding Window variables
+    n = len(seq_ids)
     base = 0
     next_seq_num = 0
-    packet_start_times: Dict[int, float] = {}
-
-    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
-        sock.settimeout(ACK_TIMEOUT)
+    # Only recomputed when base moves
+    window_end = min(WINDOW_SIZE, n)
+    eof_sent = False
+    # First-send timestamp per packet index, 0 until sent
+    start_times = [0] * n
+
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock, selectors.DefaultSelector() as sel:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCK_BUF_SIZE)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCK_BUF_SIZE)
+        # Registered once; each wait is a single epoll_wait on Linux
+        sel.register(sock, selectors.EVENT_READ)
         addr = (HOST, PORT)
-
-        while base < len(transfers):
+        # One mmsghdr per packet, built once; packets never change after loading
+        dest = _resolve_sockaddr(addr)
+        msgs = _build_mmsgs(packets, dest)
+        # Reused for every ACK so receiving never allocates
+        ack_buf = bytearray(PACKET_SIZE)
+        ack_view = memoryview(ack_buf)
+
+        while True:
             
-            # Send new packets while window is not full
-            while next_seq_num < base + WINDOW_SIZE and next_seq_num < len(transfers):
-                seq_id, payload = transfers[next_seq_num]
-                pkt = make_packet(seq_id, payload)
-                sock.sendto(pkt, addr)
+            # Send new packets while window is not full, batched into one sendmmsg call
+            if next_seq_num < window_end:
+                sent = _sendmmsg(sock, msgs, next_seq_num, window_end)
+                now = time.monotonic_ns()
+
+                for i in range(next_seq_num, next_seq_num + sent):
+                    if not start_times[i]:
+                        start_times[i] = now
+
+                next_seq_num += sent
 
-                if seq_id not in packet_start_times:
-                    packet_start_times[seq_id] = time.time()
-                
-                next_seq_num += 1
+            if next_seq_num == n and not eof_sent:
+                sock.sendto(eof_pkt, addr)
+                eof_sent = True
 
             # Wait for ACKs, then slide window
-            try:
-                ack_pkt, _ = sock.recvfrom(PACKET_SIZE)
-                ack_id, msg = parse_ack(ack_pkt)
+            if not sel.select(ACK_TIMEOUT):
+                next_seq_num = base
+                eof_sent = False
+                continue
+
+            # Drain every queued ACK before refilling the window
+            while True:
+                try:
+                    nbytes = sock.recv_into(ack_buf, PACKET_SIZE, socket.MSG_DONTWAIT)
+                except BlockingIOError:
+                    break
+                # Too short to carry a sequence id; not an ACK from the receiver
+                if nbytes < SEQ_ID_SIZE:
+                    continue
+                ack_id, msg = parse_ack(ack_view[:nbytes])
 
                 if msg.startswith("fin"):
                     # Respond with FIN/ACK to let receiver exit cleanly
                     fin_ack = make_packet(ack_id, b"FIN/ACK")
                     sock.sendto(fin_ack, addr)
-                    duration = max(time.time() - start, 1e-6)
-                    print_metrics(total_bytes, duration, packet_delays)
+                    duration = max((time.monotonic_ns() - start) / 1e9, 1e-6)
+                    print_metrics(
+                        total_bytes, duration, delay_sum, delay_count, jitter_sum, jitter_count
+                    )
                     return
 
                 # If we get an ACK for a packet inside our window, assume all previous are received.
-                current_base_seq = transfers[base][0]
-                if ack_id > current_base_seq:
-                    while base < len(transfers) and transfers[base][0] < ack_id:
+                if base < n and ack_id > seq_ids[base]:
+                    now = time.monotonic_ns()
+                    # seq_ids is strictly increasing, so jump straight to the first unacked packet
+                    new_base = bisect_left(seq_ids, ack_id, base)
+                    for i in range(base, new_base):
                         # Calculate delay for the acknowledged packet
-                        acked_seq = transfers[base][0]
-                        if acked_seq in packet_start_times:
-                            packet_delays.append(time.time() - packet_start_times[acked_seq])
-                        base += 1
-
-            except socket.timeout:
-                next_seq_num = base
-                continue
+                        delay_ns = now - start_times[i]
+                        if delay_count:
+                            jitter_sum += abs(delay_ns - prev_delay_ns)
+                            jitter_count += 1
+                        delay_sum += delay_ns
+                        delay_count += 1
+                        prev_delay_ns = delay_ns
+                    base = new_base
+                    window_end = min(base + WINDOW_SIZE, n)
 
 
 if __name__ == "__main__":
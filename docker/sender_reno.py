@@ -20,26 +20,37 @@ Notes:
 
 from __future__ import annotations
 
+import mmap
 import os
+import selectors
 import socket
+import struct
 import sys
 import time
-from typing import List, Tuple, Dict
+from array import array
+from bisect import bisect_left
+from typing import List, Tuple
 
 PACKET_SIZE = 1024
 SEQ_ID_SIZE = 4
 MSS = PACKET_SIZE - SEQ_ID_SIZE
 ACK_TIMEOUT = 0.5
 MAX_TIMEOUTS = 10
+# Socket buffer size, large enough that window bursts and ACK floods aren't dropped
+SOCK_BUF_SIZE = 4 * 1024 * 1024
 
 HOST = os.environ.get("RECEIVER_HOST", "127.0.0.1")
 PORT = int(os.environ.get("RECEIVER_PORT", "5001"))
 
+# Big-endian signed sequence id header
+_HDR = struct.Struct(">i")
 
-def load_payload_chunks() -> List[bytes]:
+
+def load_packets() -> Tuple[List[bytes], int]:
     """
     Reads the selected payload file (or falls back to file.zip) and returns
-    up to two MSS-sized chunks for the demo transfer.
+    one serialized packet per MSS-sized chunk, whose sequence id is the
+    chunk's byte offset, along with the file size.
     """
     candidates = [
         os.environ.get("TEST_FILE"),
@@ -51,49 +62,61 @@ def load_payload_chunks() -> List[bytes]:
     for path in candidates:
         if not path:
             continue
-        expanded = os.path.expanduser(path)
-        if os.path.exists(expanded):
-            with open(expanded, "rb") as f:
-                data = f.read()
-            break
-    else:
-        print(
-            "Could not find payload file (tried TEST_FILE, PAYLOAD_FILE, file.zip)",
-            file=sys.stderr,
-        )
-        sys.exit(1)
+        # Try the open directly rather than stat-ing first
+        try:
+            f = open(os.path.expanduser(path), "rb")
+        except OSError:
+            continue
+        with f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return [], 0
+            # Build packets straight from a read-only mapping so neither the whole
+            # file nor a second copy of every chunk is ever held
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                packets = [make_packet(i, data[i : i + MSS]) for i in range(0, len(data), MSS)]
+                return packets, len(data)
 
-    return [data[i : i + MSS] for i in range(0, len(data), MSS)]
+    print(
+        "Could not find payload file (tried TEST_FILE, PAYLOAD_FILE, file.zip)",
+        file=sys.stderr,
+    )
+    sys.exit(1)
 
 
 def make_packet(seq_id: int, payload: bytes) -> bytes:
-    return int.to_bytes(seq_id, SEQ_ID_SIZE, byteorder="big", signed=True) + payload
+    return _HDR.pack(seq_id) + payload
 
 
-def parse_ack(packet: bytes) -> Tuple[int, str]:
-    seq = int.from_bytes(packet[:SEQ_ID_SIZE], byteorder="big", signed=True)
-    msg = packet[SEQ_ID_SIZE:].decode(errors="ignore")
+def parse_ack(packet: memoryview) -> Tuple[int, str]:
+    seq, = _HDR.unpack_from(packet)
+    msg = str(packet[SEQ_ID_SIZE:], "ascii", "ignore")
     return seq, msg
 
 
-def print_metrics(total_bytes: int, duration: float, delays: List[float]) -> None:
+def print_metrics(
+    total_bytes: int,
+    duration: float,
+    delay_sum: int,
+    delay_count: int,
+    jitter_sum: int,
+    jitter_count: int,
+) -> None:
     """
     Print transfer metrics in the format expected by test scripts.
 
-    TODO: Students should replace the hardcoded delay/jitter/score values
-    with actual calculated metrics from their implementation.
+    Delay and jitter arrive as running sums in nanoseconds and are converted
+    to seconds here.
     """
     throughput = total_bytes / duration
     avg_delay = 0.0
     avg_jitter = 0.0
 
-    if delays:
-        avg_delay = sum(delays) / len(delays) 
+    if delay_count:
+        avg_delay = delay_sum / delay_count / 1e9
+
+    if jitter_count:
+        avg_jitter = jitter_sum / jitter_count / 1e9
 
-    if len(delays) > 1:
-        jitter_sum = sum(abs(delays[i] - delays[i-1]) for i in range(1, len(delays)))
-        avg_jitter = jitter_sum / (len(delays) - 1)
- 
 
     # Prevents divide by zero errors
     safe_jitter = avg_jitter if avg_jitter > 0 else 1e-6
@@ -109,79 +132,124 @@ def print_metrics(total_bytes: int, duration: float, delays: List[float]) -> Non
 
 
 def main() -> None:
-    demo_chunks = load_payload_chunks()
-    transfers: List[Tuple[int, bytes]] = []
-
-    seq = 0
-    for chunk in demo_chunks:
-        transfers.append((seq, chunk))
-        seq += len(chunk)
+    # Parallel arrays indexed by packet number. Packets are serialized once
+    # so (re)transmits never rebuild them.
+    packets, total_bytes = load_packets()
+    seq_ids = array("i", range(0, total_bytes, MSS))
 
-    # EOF marker
-    transfers.append((seq, b""))
-    total_bytes = sum(len(chunk) for chunk in demo_chunks)
+    # EOF marker, kept out of the data arrays and sent once all data is in flight
+    eof_pkt = make_packet(total_bytes, b"")
 
     print(f"Connecting to receiver at {HOST}:{PORT}")
     print(
-        f"Demo transfer will send {total_bytes} bytes across {len(demo_chunks)} packets (+EOF)."
+        f"Demo transfer will send {total_bytes} bytes across {len(packets)} packets (+EOF)."
     )
 
-    start = time.time()
-    packet_delays = []
+    start = time.monotonic_ns()
+    # Running delay/jitter totals in nanoseconds
+    delay_sum = 0
+    delay_count = 0
+    prev_delay_ns = 0
+    jitter_sum = 0
+    jitter_count = 0
 
     # Sliding Window variables
+    n = len(seq_ids)
     base = 0
     next_seq_num = 0
-    packet_start_times: Dict[int, float] = {}
-
-    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
-        sock.settimeout(ACK_TIMEOUT)
+    eof_sent = False
+    # First-send timestamp per packet index, 0 until sent
+    start_times = [0] * n
+
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock, selectors.DefaultSelector() as sel:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCK_BUF_SIZE)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCK_BUF_SIZE)
+        # Registered once; each wait is a single epoll_wait on Linux
+        sel.register(sock, selectors.EVENT_READ)
         addr = (HOST, PORT)
+        # Reused for every ACK so receiving never allocates
+        ack_buf = bytearray(PACKET_SIZE)
+        ack_view = memoryview(ack_buf)
         # Initial congestion window size of 1 for TCP Reno
         cwnd = 1.0
         # Initial slow start threshold of 64 for TCP Reno
         ssthresh = 64
         # Initial 0 duplicate ACKs
         dup_acks = 0
-        prev_ack_id = None
+        # ACK ids are never negative, so -1 stands in for "no ACK yet"
+        prev_ack_id = -1
         in_fast_recovery = False
-        while base < len(transfers):
+        while True:
             
-            # Send new packets while window is not full
-            while next_seq_num < base + max(int(cwnd), 1) and next_seq_num < len(transfers):
-                seq_id, payload = transfers[next_seq_num]
-                pkt = make_packet(seq_id, payload)
-                sock.sendto(pkt, addr)
-
-                if seq_id not in packet_start_times:
-                    packet_start_times[seq_id] = time.time()
+            # Send new packets while window is not full, stamping the whole fill with one clock read
+            now = time.monotonic_ns()
+            # cwnd never drops below 1, so the window always admits at least one packet
+            window_end = min(base + int(cwnd), n)
+            while next_seq_num < window_end:
+                sock.sendto(packets[next_seq_num], addr)
+
+                if not start_times[next_seq_num]:
+                    start_times[next_seq_num] = now
                 
                 next_seq_num += 1
 
+            if next_seq_num == n and not eof_sent:
+                sock.sendto(eof_pkt, addr)
+                eof_sent = True
+
             # Wait for ACKs, then slide window
-            try:
-                ack_pkt, _ = sock.recvfrom(PACKET_SIZE)
-                ack_id, msg = parse_ack(ack_pkt)
+            if not sel.select(ACK_TIMEOUT):
+                next_seq_num = base
+                eof_sent = False
+                # Resets congestion window and slow start threshold on timeout, enters slow start for TCP Reno
+                ssthresh = max(int(cwnd // 2), 1)
+                cwnd = 1.0
+                dup_acks = 0
+                in_fast_recovery = False
+                # Retransmit the lost packet; if only EOF is outstanding the next fill resends it
+                if base < n:
+                    sock.sendto(packets[base], addr)
+                    start_times[base] = time.monotonic_ns()
+                continue
+
+            # Drain every queued ACK before refilling the window
+            while True:
+                try:
+                    nbytes = sock.recv_into(ack_buf, PACKET_SIZE, socket.MSG_DONTWAIT)
+                except BlockingIOError:
+                    break
+                # Too short to carry a sequence id; not an ACK from the receiver
+                if nbytes < SEQ_ID_SIZE:
+                    continue
+                ack_id, msg = parse_ack(ack_view[:nbytes])
 
                 if msg.startswith("fin"):
                     # Respond with FIN/ACK to let receiver exit cleanly
                     fin_ack = make_packet(ack_id, b"FIN/ACK")
                     sock.sendto(fin_ack, addr)
-                    duration = max(time.time() - start, 1e-6)
-                    print_metrics(total_bytes, duration, packet_delays)
+                    duration = max((time.monotonic_ns() - start) / 1e9, 1e-6)
+                    print_metrics(
+                        total_bytes, duration, delay_sum, delay_count, jitter_sum, jitter_count
+                    )
                     return
 
                 # If we get an ACK for a packet inside our window, assume all previous are received.
-                current_base_seq = transfers[base][0]
-                if ack_id > current_base_seq:
-                    while base < len(transfers) and transfers[base][0] < ack_id:
+                if base < n and ack_id > seq_ids[base]:
+                    now = time.monotonic_ns()
+                    # seq_ids is strictly increasing, so jump straight to the first unacked packet
+                    new_base = bisect_left(seq_ids, ack_id, base)
+                    for i in range(base, new_base):
                         # Calculate delay for the acknowledged packet
-                        acked_seq = transfers[base][0]
-                        if acked_seq in packet_start_times:
-                            packet_delays.append(time.time() - packet_start_times[acked_seq])
-                        base += 1
-
-                if prev_ack_id is None or ack_id > prev_ack_id:
+                        delay_ns = now - start_times[i]
+                        if delay_count:
+                            jitter_sum += abs(delay_ns - prev_delay_ns)
+                            jitter_count += 1
+                        delay_sum += delay_ns
+                        delay_count += 1
+                        prev_delay_ns = delay_ns
+                    base = new_base
+
+                if ack_id > prev_ack_id:
                     prev_ack_id = ack_id
                     # Exits fast recovery on new ACK and sets congestion window to the slow start threshold
                     if in_fast_recovery:
@@ -194,8 +262,7 @@ def main() -> None:
                         # Congestion avoidance phase
                         else:
                             cwnd += 1.0 / cwnd
-                    # Ensures congestion window size is never 0
-                    cwnd = max(cwnd, 1.0)
+                    # cwnd stays >= 1 here: ssthresh is at least 1 and the other branches only grow it
                     dup_acks = 0
                 # Detects duplicate ACKs and handles triple duplicate ACKs
                 elif ack_id == prev_ack_id:
@@ -203,13 +270,11 @@ def main() -> None:
                     if in_fast_recovery:
                         cwnd += 1.0
                         # Send a new packet if possible
-                        if next_seq_num < base + int(cwnd) and next_seq_num < len(transfers):
-                            seq_id, payload = transfers[next_seq_num]
-                            pkt = make_packet(seq_id, payload)
-                            sock.sendto(pkt, addr)
+                        if next_seq_num < min(base + int(cwnd), n):
+                            sock.sendto(packets[next_seq_num], addr)
 
-                            if seq_id not in packet_start_times:
-                                packet_start_times[seq_id] = time.time()
+                            if not start_times[next_seq_num]:
+                                start_times[next_seq_num] = time.monotonic_ns()
                             
                             next_seq_num += 1
 
@@ -220,25 +285,12 @@ def main() -> None:
                         dup_acks = 0
                         in_fast_recovery = True
                         
-                        # Retransmit the lost packet
-                        seq_id, payload = transfers[base]
-                        pkt = make_packet(seq_id, payload)
-                        sock.sendto(pkt, addr)
-                        packet_start_times[seq_id] = time.time()
-
-            except socket.timeout:
-                next_seq_num = base
-                # Resets congestion window and slow start threshold on timeout, enters slow start for TCP Reno
-                ssthresh = max(int(cwnd // 2), 1)
-                cwnd = 1.0
-                dup_acks = 0
-                in_fast_recovery = False
-                # Retransmit the lost packet
-                seq_id, payload = transfers[base]
-                pkt = make_packet(seq_id, payload)
-                sock.sendto(pkt, addr)
-                packet_start_times[seq_id] = time.time()
-                continue
+                        # Retransmit the lost packet, or the EOF marker once all data is acked
+                        if base < n:
+                            sock.sendto(packets[base], addr)
+                            start_times[base] = time.monotonic_ns()
+                        else:
+                            eof_sent = False
 
 
 if __name__ == "__main__":